@@ -3,13 +3,19 @@
 This file holds HX711 class and ADC class which is used within HX711 in order to track multiple ADCs
 """
 
+import gc
 import RPi.GPIO as GPIO
-from time import sleep, perf_counter
+from array import array
+from threading import Lock
+from time import sleep, perf_counter, monotonic_ns
 from statistics import mean, median, stdev
 from .utils import convert_to_list
-from logging import getLogger, Logger, StreamHandler
+from logging import getLogger, Logger, StreamHandler, DEBUG, INFO
 from typing import List
 
+# an SCK pulse of 60us or longer puts the HX711 into power down mode
+_MAX_SCK_PULSE_NS = 60_000
+
 class HX711:
     """
     HX711 class holds data for one or multiple ADCs.
@@ -51,6 +57,7 @@ class HX711:
         self._logger.addHandler(consoleLogHandler)
         self._single_adc = False
         self._all_or_nothing = all_or_nothing
+        self._read_lock = Lock()
         self._dout_pins = dout_pins
         self._sck_pin = sck_pin
         # init GPIO before channel because a read operation is required for channel initialization
@@ -104,6 +111,7 @@ class HX711:
                 f'channel_A_gain must be A or B.\nReceived channel_A_gain: {channel_A_gain}'
             )
         self.__channel_A_gain = channel_A_gain
+        self._recompute_extra_pulses()
 
     @property
     def _channel_select(self):
@@ -118,6 +126,24 @@ class HX711:
                 f'channel_select must be A or B.\nReceived channel_select: {channel_select}'
             )
         self.__channel_select = channel_select
+        self._recompute_extra_pulses()
+
+    def _recompute_extra_pulses(self):
+        """ cache the number of extra SCK pulses needed after each 24-bit read to set the channel and gain.
+        The configuration is constant after init, so this avoids re-deriving it on every read """
+        try:
+            channel_select = self._channel_select
+            channel_A_gain = self._channel_A_gain
+        except AttributeError:
+            # during __init__ only one of the two settings is assigned so far
+            return
+        # get number of pulses based on channel configuration
+        num_pulses = 2  # default 2 for channel B
+        if channel_select == 'A' and channel_A_gain == 128:
+            num_pulses = 1
+        elif channel_select == 'A' and channel_A_gain == 64:
+            num_pulses = 3
+        self._num_extra_pulses = num_pulses
 
     def _init_gpio(self):
         # init GPIO
@@ -133,30 +159,37 @@ class HX711:
 
     def _prepare_to_read(self):
         """
-        prepare to read by setting SCK output to LOW and loop until all dout inputs are LOW
+        prepare to read by setting SCK output to LOW and waiting until all dout inputs are LOW
 
         Returns:
-            bool : True if ready to read else False 
+            bool : True if ready to read else False
         """
 
         GPIO.output(self._sck_pin, False)  # start by setting the pd_sck to 0
 
-        # check if ready a maximum of 20 times (~200ms)
-        # should usually be about 10 iterations with 10Hz sampling
-        for i in range(20):
-            # confirm all dout pins are ready (LOW)
-            if all([adc._is_ready() for adc in self._adcs]):
-                break
-            else:
-                # if not ready sleep for 10ms before next iteration
-                sleep(0.01)
+        # wait up to ~200ms total for each dout pin to fall LOW (data ready)
+        # wait_for_edge blocks in the kernel rather than sleep-polling, so the
+        # wakeup happens within us of the falling edge with no cpu spinning
+        wait_start = perf_counter()
+        for adc in self._adcs:
+            if not adc._is_ready():
+                timeout_ms = int(
+                    (0.2 - (perf_counter() - wait_start)) * 1000)
+                if timeout_ms > 0:
+                    GPIO.wait_for_edge(adc._dout_pin,
+                                       GPIO.FALLING,
+                                       timeout=timeout_ms)
+                # check the level again in case the edge fired (or had
+                # already fallen before the wait was armed)
+                adc._is_ready()
         ready = all([adc._ready for adc in self._adcs])
+        wait_duration = perf_counter() - wait_start
         if ready:
             self._logger.debug(
-                f'checked sensor readiness, completed after {i+1} iterations')
+                f'checked sensor readiness, ready after {round(wait_duration*1000, 1)}ms')
         else:
             self._logger.warn(
-                f'checked sensor readiness, not ready after {i+1} iterations')
+                f'checked sensor readiness, not ready after {round(wait_duration*1000, 1)}ms')
         return ready
 
     def _pulse_sck_high(self):
@@ -167,16 +200,15 @@ class HX711:
             bool: True if pulse was shorter than 60 ms
         """
 
-        pulse_start = perf_counter()
+        pulse_start = monotonic_ns()
         GPIO.output(self._sck_pin, True)
         GPIO.output(self._sck_pin, False)
-        pulse_end = perf_counter()
-        # check if pulse lasted 60ms or longer. If so, HX711 enters power down mode
+        pulse_duration = monotonic_ns() - pulse_start
         # check if the hx 711 did not turn off...
-        if pulse_end - pulse_start >= 0.00006:
+        if pulse_duration >= _MAX_SCK_PULSE_NS:
             # if pd_sck pin is HIGH for 60 us and more than the HX 711 enters power down mode.
             self._logger.warn(
-                f'sck pulse lasted for longer than 60us\nTime elapsed: {pulse_end - pulse_start}'
+                f'sck pulse lasted for longer than 60us\nTime elapsed: {pulse_duration}ns'
             )
             return False
         return True
@@ -194,15 +226,8 @@ class HX711:
             bool: True if pulses were all successful
         """
 
-        # get number of pulses based on channel configuration
-        num_pulses = 2  # default 2 for channel B
-        if self._channel_select == 'A' and self._channel_A_gain == 128:
-            num_pulses = 1
-        elif self._channel_select == 'A' and self._channel_A_gain == 64:
-            num_pulses = 3
-
-        # pulse num_pulses
-        for _ in range(num_pulses):
+        # pulse the cached number of pulses for the channel configuration
+        for _ in range(self._num_extra_pulses):
             if not self._pulse_sck_high():
                 return False
         return True
@@ -230,23 +255,61 @@ class HX711:
         if not self._prepare_to_read() and self._all_or_nothing:
             return False
 
-        # for each bit in 24 bits, perform ADC read
-        for _ in range(24):
-            # pulse sck high to request each bit
-            if not self._pulse_sck_high():
-                return False
-            for adc in self._adcs:
-                if adc._ready:
-                    adc._shift_and_read()
+        # the 24-bit frame plus the channel-gain pulses form one bus
+        # transaction: hold the lock so no other thread in the process can
+        # interleave GPIO calls mid-frame, and pause gc so a collection pause
+        # can't stretch an SCK pulse past the 60us power-down threshold
+        with self._read_lock:
+            gc_was_enabled = gc.isenabled()
+            gc.disable()
+            try:
+                # clock in the full 24-bit frame in one tight loop, accumulating each
+                # ADC raw value locally and handing off to the ADC objects once per
+                # frame instead of once per bit. The fewer python operations between
+                # SCK pulses, the lower the chance of stretching a pulse past the
+                # 60us power-down threshold, so bind the GPIO functions and pins to
+                # locals and only check the pulse timing once for the whole frame
+                gpio_output = GPIO.output
+                gpio_input = GPIO.input
+                sck_pin = self._sck_pin
+                adcs = self._adcs
+                raw_reads = [0] * len(adcs)
+                # readiness is fixed for the duration of the frame, so filter down to
+                # the ready pins once here instead of re-checking 24 times per ADC
+                ready_pins = [(i, adc._dout_pin) for i, adc in enumerate(adcs)
+                              if adc._ready]
+                frame_start = monotonic_ns()
+                for _ in range(24):
+                    # pulse sck high to request each bit
+                    gpio_output(sck_pin, True)
+                    gpio_output(sck_pin, False)
+                    for i, dout_pin in ready_pins:
+                        # left shift by one bit then bitwise OR with the new bit
+                        raw_reads[i] = (raw_reads[i] << 1) | gpio_input(dout_pin)
+                frame_duration = monotonic_ns() - frame_start
+                # a frame is 24 sck pulses. If any single pulse lasted 60us or longer
+                # the HX711 entered power down mode mid-frame, which a per-frame time
+                # check can only catch on average, but a gc run or context switch long
+                # enough to trip it will push the whole frame over 24 * 60us anyway
+                if frame_duration >= 24 * _MAX_SCK_PULSE_NS:
+                    self._logger.warn(
+                        f'24-bit read took longer than {24 * _MAX_SCK_PULSE_NS}ns, data is likely garbage\nTime elapsed: {frame_duration}ns'
+                    )
+                    return False
+
+                # set channel after read
+                if not self._write_channel_gain():
+                    return False
+            finally:
+                if gc_was_enabled:
+                    gc.enable()
+
         # finalize each ADC raw read
-        for adc in self._adcs:
+        for adc, raw_read in zip(self._adcs, raw_reads):
             if adc._ready:
+                adc._current_raw_read = raw_read
                 adc._finish_raw_read()
 
-        # set channel after read
-        if not self._write_channel_gain():
-            return False
-
         return True
 
     def read_raw(self, readings_to_average: int = 10, use_prev_read: bool = False):
@@ -282,9 +345,11 @@ class HX711:
                 if adc._ready:
                     adc._calculate_measurement()
 
-            all_adc_vars = "\n".join([str(vars(adc)) for adc in self._adcs])
-            self._logger.info(
-                f'Finished read operation. ADC results:\n{all_adc_vars}')
+            # only build the (large) vars dump if info logging is enabled
+            if self._logger.isEnabledFor(INFO):
+                all_adc_vars = "\n".join([str(vars(adc)) for adc in self._adcs])
+                self._logger.info(
+                    f'Finished read operation. ADC results:\n{all_adc_vars}')
 
             adc_measurements = [
                 adc.measurement_from_zero for adc in self._adcs]
@@ -549,7 +614,7 @@ class ADC:
         _weight_multiple (float):   multiple to convert from raw measurement to real world value
         _ready (bool):              bool for checking sensor ready
         _current_raw_read (int):    current raw read from binary bit read
-        raw_reads ([int]):          raw reads from binary bit read as 2s complement from ADC
+        raw_reads (array of int):   raw reads from binary bit read as 2s complement from ADC
         reads ([signed int])        raw reads after convert to signed integer
         _max_stdev (int):           max standard deviation value of raw reads (future todo: expose for user input? Does this vary per hardware?)
         _reads_filtered ([int])     filtered reads after removing failed reads and bad datapoints
@@ -574,7 +639,9 @@ class ADC:
         self._weight_multiple = 1.
         self._ready = False
         self._current_raw_read = 0
-        self.raw_reads = []
+        # store raw reads in a C-typed array rather than a list of python
+        # ints: a 24-bit sample fits a signed long without per-sample boxing
+        self.raw_reads = array('l')
         self.reads = []
         self._max_stdev = 100
         self._reads_filtered = []
@@ -609,7 +676,7 @@ class ADC:
 
     def _init_set_of_reads(self):
         """ init arrays and calculated values before beginning a set of reads for a measurement """
-        self.raw_reads = []
+        self.raw_reads = array('l')
         self.reads = []
         self._reads_filtered = []
         self._read_med = None
@@ -634,22 +701,10 @@ class ADC:
             self._ready = (GPIO.input(self._dout_pin) == 0)
             return self._ready
 
-    def _shift_and_read(self):
-        """ left shift by one bit then bitwise OR with the new bit """
-        self._current_raw_read = (self._current_raw_read << 1) | GPIO.input(
-            self._dout_pin)
-
     def _finish_raw_read(self):
-        """ append current raw read value and signed value to raw_reads list and reads list """
+        """ append current raw read value to raw_reads list.
+        Conversion to signed values is deferred to _calculate_measurement so the per-sample path stays short """
         self.raw_reads.append(self._current_raw_read)
-        # convert to signed value
-        self._current_signed_value = self.convert_to_signed_value(
-            self._current_raw_read)
-        self.reads.append(self._current_signed_value)
-        # log 2's complement value and signed value
-        self._logger.debug(
-            f'Binary value: {bin(self._current_raw_read)} -> Signed: {self._current_signed_value}'
-        )
 
     def convert_to_signed_value(self, raw_value):
         # convert to signed value after verifying value is valid
@@ -658,19 +713,14 @@ class ADC:
             self._logger.debug('Invalid raw value detected: {}'.format(
                 hex(raw_value)))
             return None  # return None because the data is invalid
-        # calculate int from 2's complement
-        # check if the sign bit is 1, indicating a negative number
-        if (raw_value & 0x800000):
-            # convert from 2's complement to negative int
-            signed_value = -((raw_value ^ 0xffffff) + 1)
-        else:  # else do not do anything the value is positive number
-            signed_value = raw_value
-        return signed_value
+        # calculate int from 2's complement with a branchless sign extension:
+        # xor flips the sign bit, the subtraction restores it with sign carried
+        return (raw_value ^ 0x800000) - 0x800000
 
     def _calculate_measurement(self):
         """
         analyzes read values to calculate mean value
-            1) filter by valid data only
+            1) convert raw reads to signed values and filter by valid data only
             2) calculate median and standard deviations from median
             3) filter based on the standard deviations from the median
             4) calculate mean of remaining values
@@ -679,10 +729,21 @@ class ADC:
             bool: pass or fail boolean based on filtering of data
         """
 
-        # filter reads to valid data only
-        self._reads_filtered = [
-            r for r in self.reads if ((r is not None) and (type(r) is int))
-        ]
+        # convert the batch of raw reads to signed values and filter to valid
+        # data in a single pass over the buffer
+        convert = self.convert_to_signed_value
+        self.reads = []
+        self._reads_filtered = []
+        for raw_read in self.raw_reads:
+            signed_value = convert(raw_read)
+            self.reads.append(signed_value)
+            if signed_value is not None:
+                self._reads_filtered.append(signed_value)
+        # only build the bin() string conversions if debug logging is enabled
+        if self._logger.isEnabledFor(DEBUG):
+            self._logger.debug(
+                f'Binary values: {[bin(r) for r in self.raw_reads]} -> Signed: {self.reads}'
+            )
         if not len(self._reads_filtered):
             # no values after filter, so return False to indicate no read value
             return False